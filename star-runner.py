@@ -1,16 +1,66 @@
 from designer import *
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
 from random import randint
+import itertools
 import math
+import threading
 import time
+import pygame
 
+# When True, a line under the score shows how many pixels designer updated on screen in the last frame.
+SHOW_RENDER_STATS = False
 
-class Rocks(Emoji):
-    speed: float
-    direction: int
-    x: int
-    y: int
-    creation_time: float
+# When True, the input-to-display latency histograms are printed when the game ends.
+SHOW_INPUT_LATENCY = False
+# Width of each bucket in the input-to-display latency histogram, in milliseconds.
+LATENCY_BUCKET_MS = 10
+
+# When True, the game logic runs at SIMULATION_RATE ticks per second on its own thread, and the screen
+# shows positions interpolated between the last two ticks.
+THREADED_SIMULATION = False
+SIMULATION_RATE = 30
+
+# Every emoji the game draws, measured once at the start so the game logic knows their sizes.
+GLYPHS = ('🛸', '🌟', '🔄', '💵', 'comet', '⚡', '🪨')
+SPRITE_IDS = itertools.count()
+
+
+@dataclass
+class Sprite:
+    '''
+    Something in the game that is drawn as an emoji. The game logic only works with these plain values,
+    and the screen is updated from them, so the logic never touches designer objects.
+    '''
+    glyph: str
+    x: float
+    y: float
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+    flip_x: bool = False
+    anchor: str = 'center'
+    id: int = field(default_factory=lambda: next(SPRITE_IDS))
+
+
+@dataclass
+class Rocks(Sprite):
+    speed: float = 3.0
+    direction: int = 0
+    creation_time: float = 0.0
+
+
+@dataclass(frozen=True)
+class RenderSnapshot:
+    '''
+    An immutable copy of what the screen should show after a tick of the game logic.
+    Each sprite is stored as (id, glyph, x, y, scale_x, scale_y, flip_x, anchor).
+    '''
+    tick: int
+    time: float
+    sprites: tuple[tuple[int, str, float, float, float, float, bool, str], ...]
+    score: int
+    game_over: bool
 
 
 @dataclass
@@ -18,14 +68,14 @@ class Game:
     '''
     Represents the game state with various attributes.
     '''
-    character: DesignerObject
+    character: Sprite
     character_speed: int
     character_speed_y: int
-    stars: list[DesignerObject]
-    comets: list[DesignerObject]
-    lightning: list[DesignerObject]
-    frenzy_list: list[DesignerObject]
-    reset_powerup: list[DesignerObject]
+    stars: list[Sprite]
+    comets: list[Sprite]
+    lightning: list[Sprite]
+    frenzy_list: list[Sprite]
+    reset_powerup: list[Sprite]
     score: int
     rocks_list: list[Rocks]
     counter: DesignerObject
@@ -39,20 +89,38 @@ class Game:
     last_rock_speed_factor: float
     comet_scale_interval: int
     rock_speed_interval: int
-
-
-def create_character() -> DesignerObject:
+    input_queue: deque = field(default_factory=deque)
+    held_keys: list[str] = field(default_factory=list)
+    applied_inputs: list[tuple[float, int, int]] = field(default_factory=list)
+    update_count: int = 0
+    frames_presented: int = 0
+    input_latency_ms: dict[int, int] = field(default_factory=dict)
+    input_latency_frames: dict[int, int] = field(default_factory=dict)
+    input_latency_updates: dict[int, int] = field(default_factory=dict)
+    latency_reported: bool = False
+    pixels_redrawn: int = 0
+    render_stats: Optional[DesignerObject] = None
+    glyph_sizes: dict[str, tuple[int, int]] = field(default_factory=dict)
+    game_over: bool = False
+    simulation_lock: threading.Lock = field(default_factory=threading.Lock)
+    snapshots: tuple[RenderSnapshot, ...] = ()
+    published_inputs: list[tuple[float, int, int]] = field(default_factory=list)
+    sim_ticks_dropped: int = 0
+    shown_sprites: dict[int, DesignerObject] = field(default_factory=dict)
+    inputs_to_show: list[tuple[float, int, int]] = field(default_factory=list)
+    tick_shown: int = 0
+    game_over_shown: bool = False
+    snapshots_dropped: int = 0
+    render_frames_duplicated: int = 0
+
+
+def create_character() -> Sprite:
     '''
     Creates a character that is controlled by the user
     Returns:
-        DesignerObject: The created character
+        Sprite: The created character
     '''
-    character = emoji('🛸')
-    character.scale_x = 1.2
-    character.scale_y = 1.2
-    character.flip_x = True
-    character.y = get_height() * (2 / 3)
-    return character
+    return Sprite('🛸', get_width() / 2, get_height() * (2 / 3), scale_x=1.2, scale_y=1.2, flip_x=True)
 
 
 def move_character(game: Game):
@@ -118,33 +186,108 @@ def move_down(game: Game):
     game.character_speed_y = characterspeed_y
 
 
+def queue_key_event(game: Game, key: str, pressed: bool):
+    '''
+    Queue an arrow key press or release, with the time, frame and update it arrived in, to be applied on the next update.
+    Args:
+        game (Game): The game state.
+        key (str): The key that changed.
+        pressed (bool): True if the key was pressed, False if it was released.
+    '''
+    if key in ('left', 'right', 'up', 'down'):
+        game.input_queue.append((key, pressed, time.perf_counter(), game.frames_presented, game.update_count))
+
+
 def change_direction(game: Game, key: str):
     '''
-    Change the character's direction based on the provided key.
+    Queue a change of the character's direction based on the provided key.
     Args:
         game (Game): The game state.
         key (str): The key representing the direction change.
     '''
-    if key == 'left':
-        move_left(game)
-    if key == 'right':
-        move_right(game)
-    if key == 'up':
-        move_up(game)
-    if key == 'down':
-        move_down(game)
+    queue_key_event(game, key, True)
 
 
 def stop_character_movement(game: Game, key: str):
     '''
-    Stop the character's movement based on the provided key.
+    Queue stopping the character's movement based on the provided key.
     Args:
         game (Game): The game state.
         key (str): The key representing the movement direction to stop.
     '''
-    if key == 'right' or key == 'left' or key == 'up' or key == 'down':
+    queue_key_event(game, key, False)
+
+
+def apply_queued_input(game: Game):
+    '''
+    Apply all queued key events at the start of the update, keeping track of which keys are held
+    so releasing a key only stops movement along its own axis.
+    Args:
+        game (Game): The game state.
+    '''
+    game.update_count += 1
+    while game.input_queue:
+        key, pressed, timestamp, frame, update = game.input_queue.popleft()
+        if key in game.held_keys:
+            game.held_keys.remove(key)
+        if pressed:
+            game.held_keys.append(key)
+        game.applied_inputs.append((timestamp, frame, update))
+
+    horizontal = [key for key in game.held_keys if key == 'left' or key == 'right']
+    vertical = [key for key in game.held_keys if key == 'up' or key == 'down']
+    if not horizontal:
         game.character_speed = 0
+    elif horizontal[-1] == 'left':
+        move_left(game)
+    else:
+        move_right(game)
+    if not vertical:
         game.character_speed_y = 0
+    elif vertical[-1] == 'up':
+        move_up(game)
+    else:
+        move_down(game)
+
+
+def record_input_latency(game: Game):
+    '''
+    Count a frame that was just shown on screen, and record how long the key events applied before it took
+    to get there, in milliseconds, frames shown and updates run. Designer skips drawing frames to keep
+    updates on time, so under load a key press can wait several updates before it is shown.
+    Args:
+        game (Game): The game state.
+    '''
+    now = time.perf_counter()
+    game.frames_presented += 1
+    for timestamp, frame, update in game.inputs_to_show:
+        bucket = int((now - timestamp) * 1000) // LATENCY_BUCKET_MS * LATENCY_BUCKET_MS
+        game.input_latency_ms[bucket] = game.input_latency_ms.get(bucket, 0) + 1
+        frames = game.frames_presented - frame
+        game.input_latency_frames[frames] = game.input_latency_frames.get(frames, 0) + 1
+        updates = game.update_count - update
+        game.input_latency_updates[updates] = game.input_latency_updates.get(updates, 0) + 1
+    game.inputs_to_show = []
+
+
+def report_input_latency(game: Game):
+    '''
+    Print the input-to-display latency histograms collected during the game once, if turned on.
+    Args:
+        game (Game): The game state.
+    '''
+    if not SHOW_INPUT_LATENCY or game.latency_reported:
+        return
+    game.latency_reported = True
+    print("Input latency (ms):")
+    for bucket in sorted(game.input_latency_ms):
+        print("  " + str(bucket) + "-" + str(bucket + LATENCY_BUCKET_MS) + ": " + str(game.input_latency_ms[bucket]))
+    print("Input latency (frames):")
+    for frames in sorted(game.input_latency_frames):
+        print("  " + str(frames) + ": " + str(game.input_latency_frames[frames]))
+    print("Input latency (updates):")
+    for updates in sorted(game.input_latency_updates):
+        print("  " + str(updates) + ": " + str(game.input_latency_updates[updates]))
 
 
 def opposite_entrance(game: Game):
@@ -159,29 +302,23 @@ def opposite_entrance(game: Game):
         game.character.x = get_width()
 
 
-def create_star() -> DesignerObject:
+def create_star() -> Sprite:
     '''
     Create a star object.
     Returns:
-        DesignerObject: The created star object.
+        Sprite: The created star object.
     '''
-    star = emoji('🌟')
-    star.scale_x = 1
-    star.anchor = 'midtop'
-    star.x = randint(0, get_width())
-    star.y = 0
+    star = Sprite('🌟', randint(0, get_width()), 0, anchor='midtop')
     return star
 
 
-def create_reset_powerup() -> DesignerObject:
+def create_reset_powerup() -> Sprite:
     '''
     Create a reset power-up object.
     Returns:
-        DesignerObject: The created reset power-up object.
+        Sprite: The created reset power-up object.
     '''
-    reset = emoji('🔄')
-    reset.x = randint(0, get_width())
-    reset.y = 0
+    reset = Sprite('🔄', randint(0, get_width()), 0)
     return reset
 
 
@@ -209,17 +346,13 @@ def make_star(game: Game):
         game.stars.append(create_star())
 
 
-def create_frenzy_powerup() -> DesignerObject:
+def create_frenzy_powerup() -> Sprite:
     '''
     Create a frenzy power-up object.
     Returns:
-        DesignerObject: The created frenzy power-up object.
+        Sprite: The created frenzy power-up object.
     '''
-    frenzy = emoji('💵')
-    frenzy.scale_x = 1
-    frenzy.anchor = 'midtop'
-    frenzy.x = randint(0, get_width())
-    frenzy.y = 0
+    frenzy = Sprite('💵', randint(0, get_width()), 0, anchor='midtop')
     return frenzy
 
 
@@ -245,23 +378,16 @@ def destroy_stars_on_ground(game: Game):
     for star in game.stars:
         if star.y < get_height():
             kept_stars.append(star)
-        else:
-            destroy(star)
     game.stars = kept_stars
 
 
-def create_comet() -> DesignerObject:
+def create_comet() -> Sprite:
     '''
     Create a comet object.
     Returns:
-        DesignerObject: The created comet object.
-    '''
-    comet = emoji('comet')
-    comet.scale_x = 1.3
-    comet.scale_y = 1.3
-    comet.anchor = 'midtop'
-    comet.x = randint(0, get_width())
-    comet.y = 0
+        Sprite: The created comet object.
+    '''
+    comet = Sprite('comet', randint(0, get_width()), 0, scale_x=1.3, scale_y=1.3, anchor='midtop')
     return comet
 
 
@@ -287,8 +413,6 @@ def destroy_reset_on_ground(game: Game):
     for reset in game.reset_powerup:
         if reset.y < get_height():
             kept_resets.append(reset)
-        else:
-            destroy(reset)
     game.reset_powerup = kept_resets
 
 
@@ -302,8 +426,6 @@ def destroy_lightning_on_ground(game: Game):
     for lightning in game.lightning:
         if lightning.y < get_height():
             kept_lightning.append(lightning)
-        else:
-            destroy(lightning)
     game.lightning = kept_lightning
 
 
@@ -317,8 +439,6 @@ def destroy_comets_on_ground(game: Game):
     for comet in game.comets:
         if comet.y < get_height():
             kept_comets.append(comet)
-        else:
-            destroy(comet)
     game.comets = kept_comets
 
 
@@ -332,8 +452,6 @@ def destroy_frenzy_on_ground(game: Game):
     for frenzy in game.frenzy_list:
         if frenzy.y < get_height():
             kept_frenzies.append(frenzy)
-        else:
-            destroy(frenzy)
     game.frenzy_list = kept_frenzies
 
 
@@ -349,15 +467,13 @@ def generate_mass_stars(game: Game):
         game.frenzy_active = False
 
 
-def create_lightning() -> DesignerObject:
+def create_lightning() -> Sprite:
     '''
     Create a lightning object.
     Returns:
-        DesignerObject: The created lightning object.
+        Sprite: The created lightning object.
     '''
-    lightning = emoji('⚡')
-    lightning.x = randint(0, get_width())
-    lightning.y = 0
+    lightning = Sprite('⚡', randint(0, get_width()), 0)
     return lightning
 
 
@@ -391,6 +507,49 @@ def make_objects_drop(game: Game):
         reset.y += 11
 
 
+def get_bounds(game: Game, sprite: Sprite) -> tuple[float, float, float, float]:
+    '''
+    Calculate the screen rectangle covered by a sprite, taking its scale and anchor into account.
+    Args:
+        game (Game): The game state.
+        sprite (Sprite): The sprite to measure.
+    Returns:
+        tuple[float, float, float, float]: The left, top, width and height of the sprite.
+    '''
+    base_width, base_height = game.glyph_sizes[sprite.glyph]
+    width = base_width * sprite.scale_x
+    height = base_height * sprite.scale_y
+    if 'left' in sprite.anchor:
+        left = sprite.x
+    elif 'right' in sprite.anchor:
+        left = sprite.x - width
+    else:
+        left = sprite.x - width / 2
+    if 'top' in sprite.anchor:
+        top = sprite.y
+    elif 'bottom' in sprite.anchor:
+        top = sprite.y - height
+    else:
+        top = sprite.y - height / 2
+    return left, top, width, height
+
+
+def sprites_collide(game: Game, first: Sprite, second: Sprite) -> bool:
+    '''
+    Check if two sprites overlap. Like designer's colliding, sprites that only touch at an edge don't collide.
+    Args:
+        game (Game): The game state.
+        first (Sprite): The first sprite.
+        second (Sprite): The second sprite.
+    Returns:
+        bool: True if the sprites overlap, False otherwise.
+    '''
+    first_left, first_top, first_width, first_height = get_bounds(game, first)
+    second_left, second_top, second_width, second_height = get_bounds(game, second)
+    return (first_left < second_left + second_width and second_left < first_left + first_width and
+            first_top < second_top + second_height and second_top < first_top + first_height)
+
+
 def collide_character_with_star(game: Game):
     '''
     Handle collisions between the character and stars.
@@ -399,7 +558,7 @@ def collide_character_with_star(game: Game):
     '''
     destroyed_stars = []
     for star in game.stars:
-        if colliding(game.character, star):
+        if sprites_collide(game, game.character, star):
             destroyed_stars.append(star)
             game.score += 1
     game.stars = filter_stars(game.stars, destroyed_stars)
@@ -413,7 +572,7 @@ def collide_character_with_lightning(game: Game):
     '''
     destroyed_lightning = []
     for lightning in game.lightning:
-        if colliding(game.character, lightning):
+        if sprites_collide(game, game.character, lightning):
             game.speed_boost_active = True
             game.speed_boost_start_time = time.time()
             destroyed_lightning.append(lightning)
@@ -430,7 +589,7 @@ def collide_character_with_comet(game: Game) -> bool:
     '''
     comet_collision = False
     for comet in game.comets:
-        if colliding(game.character, comet):
+        if sprites_collide(game, game.character, comet):
             comet_collision = True
     return comet_collision
 
@@ -447,7 +606,7 @@ def collide_character_with_rock(game: Game) -> bool:
     '''
     rock_collision = False
     for rock in game.rocks_list:
-        if colliding(game.character, rock):
+        if sprites_collide(game, game.character, rock):
             rock_collision = True
     return rock_collision
 
@@ -460,7 +619,7 @@ def collide_character_with_frenzy(game: Game):
     '''
     destroyed_frenzy = []
     for frenzy in game.frenzy_list:
-        if colliding(game.character, frenzy):
+        if sprites_collide(game, game.character, frenzy):
             game.frenzy_active = True
             game.frenzy_start_time = time.time()
             destroyed_frenzy.append(frenzy)
@@ -475,7 +634,7 @@ def collide_character_with_reset(game: Game):
     '''
     destroyed_resets = []
     for reset in game.reset_powerup:
-        if colliding(game.character, reset):
+        if sprites_collide(game, game.character, reset):
             destroyed_resets.append(reset)
             game.last_comet_scale_factor = 1.3
             game.last_rock_speed_factor = 3.0
@@ -487,76 +646,66 @@ def collide_character_with_reset(game: Game):
     game.reset_powerup = filter_resets(game.reset_powerup, destroyed_resets)
 
 
-def filter_resets(reset_list: list[DesignerObject], resets_not_to_keep: list[DesignerObject]) -> list[DesignerObject]:
+def filter_resets(reset_list: list[Sprite], resets_not_to_keep: list[Sprite]) -> list[Sprite]:
     '''
     Filter out resets that should not be kept based on a list of resets not to keep.
     Args:
-        reset_list (list[DesignerObject]): List of reset power-ups.
-        resets_not_to_keep (list[DesignerObject]): List of resets that should be filtered out.
+        reset_list (list[Sprite]): List of reset power-ups.
+        resets_not_to_keep (list[Sprite]): List of resets that should be filtered out.
     Returns:
-        list[DesignerObject]: New list of resets after filtering.
+        list[Sprite]: New list of resets after filtering.
     '''
     new_reset_list = []
     for reset in reset_list:
-        if reset in resets_not_to_keep:
-            destroy(reset)
-        else:
+        if reset not in resets_not_to_keep:
             new_reset_list.append(reset)
     return new_reset_list
 
 
-def filter_lightning(lightning_list: list[DesignerObject], lightning_not_to_keep: list[DesignerObject]) -> list[
-    DesignerObject]:
+def filter_lightning(lightning_list: list[Sprite], lightning_not_to_keep: list[Sprite]) -> list[Sprite]:
     '''
     Filter out lightning objects that should not be kept based on a list of lightning objects not to keep.
     Args:
-        lightning_list (list[DesignerObject]): List of lightning objects.
-        lightning_not_to_keep (list[DesignerObject]): List of lightning objects that should be filtered out.
+        lightning_list (list[Sprite]): List of lightning objects.
+        lightning_not_to_keep (list[Sprite]): List of lightning objects that should be filtered out.
     Returns:
-        list[DesignerObject]: New list of lightning objects after filtering.
+        list[Sprite]: New list of lightning objects after filtering.
     '''
     new_lightning_list = []
     for lightning in lightning_list:
-        if lightning in lightning_not_to_keep:
-            destroy(lightning)
-        else:
+        if lightning not in lightning_not_to_keep:
             new_lightning_list.append(lightning)
     return new_lightning_list
 
 
-def filter_stars(stars_list: list[DesignerObject], stars_not_to_keep: list[DesignerObject]) -> list[DesignerObject]:
+def filter_stars(stars_list: list[Sprite], stars_not_to_keep: list[Sprite]) -> list[Sprite]:
     '''
     Filter out stars that should not be kept based on a list of stars not to keep.
     Args:
-        stars_list (list[DesignerObject]): List of stars.
-        stars_not_to_keep (list[DesignerObject]): List of stars that should be filtered out.
+        stars_list (list[Sprite]): List of stars.
+        stars_not_to_keep (list[Sprite]): List of stars that should be filtered out.
     Returns:
-        list[DesignerObject]: New list of stars after filtering.
+        list[Sprite]: New list of stars after filtering.
     '''
     new_star_list = []
     for star in stars_list:
-        if star in stars_not_to_keep:
-            destroy(star)
-        else:
+        if star not in stars_not_to_keep:
             new_star_list.append(star)
     return new_star_list
 
 
-def filter_frenzies(frenzy_list: list[DesignerObject], frenzy_not_to_keep: list[DesignerObject]) -> list[
-    DesignerObject]:
+def filter_frenzies(frenzy_list: list[Sprite], frenzy_not_to_keep: list[Sprite]) -> list[Sprite]:
     '''
     Filter out frenzy power-ups that should not be kept based on a list of frenzies not to keep.
     Args:
-        frenzy_list (list[DesignerObject]): List of frenzy power-ups.
-        frenzy_not_to_keep (list[DesignerObject]): List of frenzy power-ups that should be filtered out.
+        frenzy_list (list[Sprite]): List of frenzy power-ups.
+        frenzy_not_to_keep (list[Sprite]): List of frenzy power-ups that should be filtered out.
     Returns:
-        list[DesignerObject]: New list of frenzy power-ups after filtering.
+        list[Sprite]: New list of frenzy power-ups after filtering.
     '''
     new_frenzy_list = []
     for frenzy in frenzy_list:
-        if frenzy in frenzy_not_to_keep:
-            destroy(frenzy)
-        else:
+        if frenzy not in frenzy_not_to_keep:
             new_frenzy_list.append(frenzy)
     return new_frenzy_list
 
@@ -577,15 +726,15 @@ def make_comets_bigger(game: Game):
         comet.scale_y = game.last_comet_scale_factor
 
 
-def create_rocks(character: DesignerObject) -> Rocks:
+def create_rocks(character: Sprite) -> Rocks:
     '''
     Create rocks based on the character position.
     Args:
-        character (DesignerObject): The character object.
+        character (Sprite): The character object.
     Returns:
         Rocks: The created rocks object.
     '''
-    return Rocks('🪨', speed=3.0, direction=0, x=randint(0, get_width()), y=0, creation_time=time.time())
+    return Rocks('🪨', randint(0, get_width()), 0, speed=3.0, direction=0, creation_time=time.time())
 
 
 def move_rocks(game: Game):
@@ -604,7 +753,6 @@ def move_rocks(game: Game):
 
         # Check if the rock has existed for more than 10 seconds (adjust the threshold as needed)
         if current_time - rock.creation_time > 10:
-            destroy(rock)
             game.rocks_list.remove(rock)
 
 
@@ -637,11 +785,14 @@ def get_angle(first_object, second_object):
 
 def update_score(game: Game):
     '''
-    Update the game score display.
+    Update the game score display from the latest snapshot.
     Args:
         game (Game): The game state.
     '''
-    game.counter.text = "Score: " + str(game.score)
+    score_text = "Score: " + str(game.snapshots[-1].score)
+    # Setting the text re-renders it even when unchanged, so only do it when the score changes.
+    if game.counter.text != score_text:
+        game.counter.text = score_text
 
 
 def set_background():
@@ -652,6 +803,215 @@ def set_background():
         "https://images.pexels.com/photos/957061/milky-way-starry-sky-night-sky-star-957061.jpeg?cs=srgb&dl=pexels-felix-mittermeier-957061.jpg&fm=jpg")
 
 
+def union_area(rects: list[pygame.Rect]) -> int:
+    '''
+    Calculate the number of on-screen pixels covered by a list of possibly overlapping rectangles.
+    Args:
+        rects (list[pygame.Rect]): The rectangles.
+    Returns:
+        int: The area of the union of the rectangles, clipped to the window.
+    '''
+    clipped = []
+    for left, top, width, height in rects:
+        x1, y1 = max(left, 0), max(top, 0)
+        x2, y2 = min(left + width, get_width()), min(top + height, get_height())
+        if x1 < x2 and y1 < y2:
+            clipped.append((x1, y1, x2, y2))
+    edges = sorted({x for rect in clipped for x in (rect[0], rect[2])})
+    area = 0
+    for slab_left, slab_right in zip(edges, edges[1:]):
+        spans = sorted((y1, y2) for x1, y1, x2, y2 in clipped if x1 <= slab_left and x2 >= slab_right)
+        covered = 0
+        span_end = None
+        for y1, y2 in spans:
+            if span_end is None or y1 > span_end:
+                covered += y2 - y1
+                span_end = y2
+            elif y2 > span_end:
+                covered += y2 - span_end
+                span_end = y2
+        area += covered * (slab_right - slab_left)
+    return area
+
+
+def watch_presented_frames(game: Game):
+    '''
+    Hook the screen update designer does at the end of each drawn frame, to record input latency and,
+    if render stats are turned on, count the pixels sent to the screen. Designer only updates the parts
+    of the screen that changed, so this is the real cost of a frame.
+    Args:
+        game (Game): The game state.
+    '''
+    # Unwrap the hook from an earlier game, so a restarted game doesn't hook it twice.
+    display_update = getattr(pygame.display.update, '__wrapped__', pygame.display.update)
+
+    def presented_update(rects=None):
+        if rects is None:
+            result = display_update()
+        else:
+            result = display_update(rects)
+        record_input_latency(game)
+        if SHOW_RENDER_STATS:
+            if rects is None:
+                game.pixels_redrawn = get_width() * get_height()
+            elif isinstance(rects, pygame.Rect):
+                game.pixels_redrawn = union_area([rects])
+            else:
+                game.pixels_redrawn = union_area(rects)
+        return result
+
+    presented_update.__wrapped__ = display_update
+    pygame.display.update = presented_update
+
+
+def update_render_stats(game: Game):
+    '''
+    Show the number of pixels redrawn in the last frame under the score, if render stats are turned on.
+    Args:
+        game (Game): The game state.
+    '''
+    if game.render_stats is not None:
+        percent = 100 * game.pixels_redrawn // (get_width() * get_height())
+        stats_text = "Redrawn: " + str(game.pixels_redrawn) + " px (" + str(percent) + "%)"
+        if game.render_stats.text != stats_text:
+            game.render_stats.text = stats_text
+
+
+def check_game_over(game: Game):
+    '''
+    End the game if the character hits a comet or a rock.
+    Args:
+        game (Game): The game state.
+    '''
+    if collide_character_with_comet(game) or collide_character_with_rock(game):
+        game.game_over = True
+
+
+def publish_snapshot(game: Game):
+    '''
+    Publish a snapshot of the sprites, score and game over state, keeping the previous snapshot for
+    interpolation. Key events applied since the last snapshot are handed over with it.
+    Args:
+        game (Game): The game state.
+    '''
+    sprites = [game.character, *game.stars, *game.comets, *game.lightning, *game.frenzy_list, *game.reset_powerup,
+               *game.rocks_list]
+    snapshot = RenderSnapshot(game.update_count, time.perf_counter(),
+                              tuple((sprite.id, sprite.glyph, sprite.x, sprite.y, sprite.scale_x, sprite.scale_y,
+                                     sprite.flip_x, sprite.anchor) for sprite in sprites),
+                              game.score, game.game_over)
+    with game.simulation_lock:
+        game.snapshots = (game.snapshots[-1] if game.snapshots else snapshot, snapshot)
+        game.published_inputs.extend(game.applied_inputs)
+    game.applied_inputs = []
+
+
+def simulation_tick(game: Game):
+    '''
+    Run one tick of the game logic and publish the result. Nothing changes once the game is over.
+    Args:
+        game (Game): The game state.
+    '''
+    if game.game_over:
+        return
+    for step in SIMULATION_STEPS:
+        step(game)
+    publish_snapshot(game)
+
+
+def run_simulation(game: Game):
+    '''
+    Run the game logic at SIMULATION_RATE ticks per second until the game is over.
+    Ticks that can't be run on time are dropped rather than caught up.
+    Args:
+        game (Game): The game state.
+    '''
+    interval = 1 / SIMULATION_RATE
+    next_tick = time.perf_counter()
+    while not game.game_over:
+        now = time.perf_counter()
+        if now < next_tick:
+            time.sleep(next_tick - now)
+            continue
+        late_ticks = int((now - next_tick) / interval)
+        if late_ticks > 0:
+            game.sim_ticks_dropped += late_ticks
+            next_tick += late_ticks * interval
+        simulation_tick(game)
+        next_tick += interval
+
+
+def present_frame(game: Game):
+    '''
+    Update the emojis on screen from the latest snapshot. Emojis are created and destroyed here, on the
+    main thread, as sprites appear and disappear. In threaded mode, positions are interpolated between
+    the last two snapshots.
+    Args:
+        game (Game): The game state.
+    '''
+    with game.simulation_lock:
+        previous, latest = game.snapshots
+        game.inputs_to_show.extend(game.published_inputs)
+        game.published_inputs = []
+    if latest.tick == game.tick_shown:
+        game.render_frames_duplicated += 1
+    else:
+        game.snapshots_dropped += latest.tick - game.tick_shown - 1
+        game.tick_shown = latest.tick
+    game.game_over_shown = latest.game_over
+
+    if THREADED_SIMULATION:
+        alpha = min(max((time.perf_counter() - latest.time) * SIMULATION_RATE, 0.0), 1.0)
+    else:
+        alpha = 1.0
+    previous_positions = {sprite[0]: (sprite[2], sprite[3]) for sprite in previous.sprites}
+    kept_sprites = {}
+    for sprite_id, glyph, x, y, scale_x, scale_y, flip_x, anchor in latest.sprites:
+        old_x, old_y = previous_positions.get(sprite_id, (x, y))
+        # Don't slide across the screen when the character wraps to the opposite side.
+        if abs(x - old_x) > get_width() / 2:
+            old_x = x
+        x = old_x + (x - old_x) * alpha
+        y = old_y + (y - old_y) * alpha
+        shown = game.shown_sprites.pop(sprite_id, None)
+        if shown is None:
+            shown = emoji(glyph, x, y, scale_x=scale_x, scale_y=scale_y, flip_x=flip_x, anchor=anchor)
+        else:
+            if shown.x != x or shown.y != y:
+                shown.x = x
+                shown.y = y
+            shown.scale = (scale_x, scale_y)
+            shown.flip_x = flip_x
+        kept_sprites[sprite_id] = shown
+    for shown in game.shown_sprites.values():
+        destroy(shown)
+    game.shown_sprites = kept_sprites
+
+
+def game_over_shown(game: Game) -> bool:
+    '''
+    Check if the snapshot on screen is the one where the game ended.
+    Args:
+        game (Game): The game state.
+    Returns:
+        bool: True if the game is over, False otherwise.
+    '''
+    return game.game_over_shown
+
+
+def report_simulation_stats(game: Game):
+    '''
+    Print the dropped and duplicated frame counters, if the game logic ran on its own thread.
+    Args:
+        game (Game): The game state.
+    '''
+    if not THREADED_SIMULATION:
+        return
+    print("Simulation ticks dropped: " + str(game.sim_ticks_dropped))
+    print("Snapshots never shown: " + str(game.snapshots_dropped))
+    print("Frames showing a repeated snapshot: " + str(game.render_frames_duplicated))
+
+
 def flash_game_over(game: Game):
     '''
     Displays a game-over message based on the player's score.
@@ -674,51 +1034,73 @@ def flash_game_over(game: Game):
         game.counter.text = "You are one of the greatest players this game has seen. FINAL SCORE" + str(game.score)
 
 
+def measure_glyphs() -> dict[str, tuple[int, int]]:
+    '''
+    Measure the unscaled size of every emoji the game draws.
+    Returns:
+        dict[str, tuple[int, int]]: The width and height of each glyph.
+    '''
+    glyph_sizes = {}
+    for glyph in GLYPHS:
+        sample = emoji(glyph, visible=False)
+        glyph_sizes[glyph] = (sample.width, sample.height)
+    return glyph_sizes
+
+
 def create_game() -> Game:
     '''
     Creates the initial game state.
     Returns:
         Game: The initial game state
     '''
-    return Game(create_character(), 0, 0, [], [], [], [], [], 0, [], text("white", 'Score:', 25, 400, 50), False, 0.0,
+    game = Game(create_character(), 0, 0, [], [], [], [], [], 0, [], text("white", 'Score:', 25, 400, 50), False, 0.0,
                 7.0,
-                False, 0.0, 3.0, 1.3, 3.0, 20, 30, )
-
+                False, 0.0, 3.0, 1.3, 3.0, 20, 30,
+                render_stats=text("white", 'Redrawn: 0 px', 18, 400, 80) if SHOW_RENDER_STATS else None,
+                glyph_sizes=measure_glyphs())
+    publish_snapshot(game)
+    watch_presented_frames(game)
+    if THREADED_SIMULATION:
+        threading.Thread(target=run_simulation, args=(game,), daemon=True).start()
+    return game
+
+
+SIMULATION_STEPS = [
+    apply_queued_input,
+    move_character,
+    move_character_y,
+    make_objects_drop,
+    destroy_stars_on_ground,
+    destroy_comets_on_ground,
+    destroy_frenzy_on_ground,
+    destroy_lightning_on_ground,
+    destroy_reset_on_ground,
+    opposite_entrance,
+    make_star,
+    make_comet,
+    make_lightning,
+    make_frenzy_powerup,
+    make_rocks,
+    make_reset_powerup,
+    move_rocks,
+    make_comets_bigger,
+    collide_character_with_star,
+    collide_character_with_lightning,
+    collide_character_with_frenzy,
+    collide_character_with_reset,
+    generate_mass_stars,
+    check_game_over,
+]
 
 when('starting', create_game)
-when('updating', move_character)
-when('updating', move_character_y)
-when('updating', make_objects_drop)
-when('updating', destroy_stars_on_ground)
-when('updating', destroy_comets_on_ground)
-when('updating', destroy_frenzy_on_ground)
-when('updating', destroy_lightning_on_ground)
-when('updating', destroy_reset_on_ground)
-when('updating', opposite_entrance)
-when('updating', make_star)
-when('updating', make_comet)
-when('updating', make_lightning)
-when('updating', make_frenzy_powerup)
-when('updating', make_rocks)
-when('updating', make_reset_powerup)
 when('starting', set_background)
-when('updating', move_rocks)
-when('updating', make_comets_bigger)
-when('updating', collide_character_with_star)
-when('updating', collide_character_with_lightning)
-when('updating', collide_character_with_frenzy)
-when('updating', collide_character_with_reset)
-when('updating', generate_mass_stars)
-when('done typing', stop_character_movement)
+if not THREADED_SIMULATION:
+    when('updating', simulation_tick)
+when('updating', present_frame)
 when('updating', update_score)
+when('updating', update_render_stats)
+when('done typing', stop_character_movement)
 when('typing', change_direction)
-when(collide_character_with_comet, flash_game_over, pause)
-when(collide_character_with_rock, flash_game_over, pause)
+when(game_over_shown, flash_game_over, report_input_latency, report_simulation_stats, pause)
 
 start()
-
-
-
-
-
-